@@ -1,58 +1,209 @@
 #!/usr/bin/env python3
 
 import argparse
+import json
 import os
 import re
-from pathlib import Path
-from typing import List, Set
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
-def is_naked_url(content: str) -> bool:
+# Surrounding whitespace is part of the pattern so the whole head is
+# classified in one pass; most notes fail on their first byte.
+_URL_RE = re.compile(rb'\s*https?://\S+\s*')
+_HEAD_SIZE = 4096
+_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+_PRUNE_DIRS = frozenset({'node_modules', '.obsidian', '.trash', '.git'})
+_CACHE_FILE = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'obsidian-conf', 'naked_urls.v3.json')
+
+def is_naked_url(content: bytes) -> bool:
     """Check if content only contains a single URL and nothing else."""
-    lines = [l.strip() for l in content.split('\n') if l.strip()]
-    if len(lines) != 1:
+    if _URL_RE.fullmatch(content) is None:
         return False
-    
-    url_pattern = r'^https?://\S+$'
-    return bool(re.match(url_pattern, lines[0]))
+    # Bytes-mode \S only excludes ASCII whitespace; recheck the rare match
+    # as text so URLs containing e.g. U+00A0 or U+3000 are rejected.
+    url = content.strip().decode('utf-8', errors='replace')
+    return url.split() == [url]
+
+def read_head(path: str) -> Optional[bytes]:
+    """Read the start of a file, or None if it is longer than _HEAD_SIZE."""
+    with open(path, 'rb', buffering=0) as f:
+        head = f.read(_HEAD_SIZE + 1)
+        # Raw reads can come back short before EOF (FUSE, SMB, NFS, signals)
+        while head and len(head) <= _HEAD_SIZE:
+            chunk = f.read(_HEAD_SIZE + 1 - len(head))
+            if not chunk:
+                break
+            head += chunk
+    if len(head) > _HEAD_SIZE:
+        return None
+    return head
+
+def load_cache() -> Dict[str, list]:
+    """Load cached classifications, keyed by absolute path."""
+    try:
+        with open(_CACHE_FILE) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def save_cache(cache: Dict[str, list]):
+    """Write cached classifications back to disk."""
+    cache_dir = os.path.dirname(_CACHE_FILE)
+    os.makedirs(cache_dir, exist_ok=True)
+    # A unique temp file keeps concurrent runs from writing into each other's
+    # output before it is swapped into place.
+    with tempfile.NamedTemporaryFile('w', dir=cache_dir, suffix='.tmp', delete=False) as f:
+        tmp = f.name
+        try:
+            json.dump(cache, f)
+        except BaseException:
+            f.close()
+            os.unlink(tmp)
+            raise
+    os.replace(tmp, _CACHE_FILE)
+
+def iter_markdown_files(directory: str) -> Iterator[os.DirEntry]:
+    """Yield directory entries for all markdown files under directory.
+
+    Hidden directories and known non-note trees in _PRUNE_DIRS are skipped,
+    as are directories that cannot be listed.
+    """
+    stack = [directory]
+    while stack:
+        path = stack.pop()
+        try:
+            it = os.scandir(path)
+        except OSError as e:
+            print(f"Error reading {path}: {e}")
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith('.') and entry.name not in _PRUNE_DIRS:
+                        stack.append(entry.path)
+                elif entry.name.endswith('.md') and entry.is_file(follow_symlinks=False):
+                    yield entry
+
+def _check_naked_url(entry: os.DirEntry,
+                     cache: Optional[Dict[str, list]]) -> Tuple[str, list, Optional[Exception]]:
+    """Classify a single file, capturing any read error for the caller.
+
+    Returns the cache key and a [mtime_ns, size, naked] record; files whose
+    mtime and size match the cached record are not read again, and neither
+    are files already known to be larger than _HEAD_SIZE. Without a cache
+    the file is not stat'ed at all and the record's mtime and size are left
+    as None.
+    """
+    key = entry.path
+    stamp = [None, None]
+    try:
+        if cache is not None:
+            key = os.path.abspath(entry.path)
+            st = entry.stat(follow_symlinks=False)
+            stamp = [st.st_mtime_ns, st.st_size]
+            cached = cache.get(key)
+            if cached is not None and cached[:2] == stamp:
+                return key, cached, None
+            if st.st_size > _HEAD_SIZE:
+                return key, stamp + [False], None
+        content = read_head(entry.path)
+        naked = content is not None and is_naked_url(content)
+        return key, stamp + [naked], None
+    except Exception as e:
+        return key, [], e
 
-def find_naked_urls(directory: str) -> List[str]:
+def find_naked_urls(directory: str, use_cache: bool = True,
+                    jobs: int = _MAX_WORKERS) -> List[str]:
     """Find all markdown files containing only a single URL."""
     naked_urls = []
+    seen = set()
+    cache = load_cache() if use_cache else None
+    entries = list(iter_markdown_files(directory))
     
-    for path in Path(directory).rglob('*.md'):
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(lambda e: _check_naked_url(e, cache), entries)
+        for entry, (key, record, error) in zip(entries, results):
+            seen.add(key)
+            if error is not None:
+                print(f"Error reading {entry.path}: {error}")
+                continue
+            if cache is not None:
+                cache[key] = record
+            if record[2]:
+                naked_urls.append(entry.path)
+    
+    if cache is not None:
+        # Forget notes under this vault that have been moved or deleted
+        root = os.path.join(os.path.abspath(directory), '')
+        for key in [k for k in cache if k.startswith(root) and k not in seen]:
+            del cache[key]
         try:
-            content = path.read_text()
-            if is_naked_url(content):
-                naked_urls.append(str(path))
-        except Exception as e:
-            print(f"Error reading {path}: {e}")
+            save_cache(cache)
+        except OSError as e:
+            print(f"Error writing cache {_CACHE_FILE}: {e}")
     
     return naked_urls
 
 def move_files(files: List[str], target_dir: str):
-    """Move files to target directory, maintaining relative paths."""
-    target_path = Path(target_dir)
-    target_path.mkdir(parents=True, exist_ok=True)
+    """Move files into target directory, renaming on name collisions.
+
+    Files that are already in the target directory are left where they are.
+    Names are compared casefolded, since vaults often live on
+    case-insensitive filesystems where Note.md and note.md collide.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    target_dir_str = os.fspath(target_dir)
+    existing = {n.casefold() for n in os.listdir(target_dir_str)}
+    target_stat = os.stat(target_dir_str)
+    in_target: Dict[str, bool] = {}
     
     for file in files:
-        src = Path(file)
-        dest = target_path / src.name
-        src.rename(dest)
-        print(f"Moved {src} to {dest}")
+        name = os.path.basename(file)
+        src_dir = os.path.dirname(file) or os.curdir
+        if src_dir not in in_target:
+            in_target[src_dir] = os.path.samestat(os.stat(src_dir), target_stat)
+        if in_target[src_dir]:
+            continue
+        if name.casefold() in existing:
+            stem, ext = os.path.splitext(name)
+            n = 1
+            while f"{stem} ({n}){ext}".casefold() in existing:
+                n += 1
+            name = f"{stem} ({n}){ext}"
+        existing.add(name.casefold())
+        dest = f"{target_dir_str}{os.sep}{name}"
+        os.rename(file, dest)
+        print(f"Moved {file} to {dest}")
+
+def positive_int(value: str) -> int:
+    """argparse type for options that need a count of at least one."""
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return n
 
 def main():
     parser = argparse.ArgumentParser(description='Analyze Obsidian vault')
     parser.add_argument('--find-naked-urls', type=str, help='Directory to search for files with naked URLs')
     parser.add_argument('--move', type=str, help='Move files with naked URLs to specified directory')
+    parser.add_argument('--jobs', type=positive_int, default=_MAX_WORKERS,
+                        help='Number of files to read concurrently (raise for network-mounted vaults)')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore and do not update the classification cache')
     
     args = parser.parse_args()
 
     if args.find_naked_urls:
-        naked_urls = find_naked_urls(args.find_naked_urls)
+        naked_urls = find_naked_urls(args.find_naked_urls, use_cache=not args.no_cache,
+                                     jobs=args.jobs)
         if naked_urls:
-            print("\nFiles containing only URLs:")
-            for file in naked_urls:
-                print(f"  {file}")
+            sys.stdout.write("\nFiles containing only URLs:\n")
+            sys.stdout.write(''.join(f"  {file}\n" for file in naked_urls))
+            sys.stdout.flush()
                 
             if args.move:
                 move_files(naked_urls, args.move)